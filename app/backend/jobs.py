@@ -0,0 +1,241 @@
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import time
+import uuid
+from itertools import islice
+
+import joblib
+
+from pipe import full_preprocess
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no room for another job"""
+
+
+class WorkersUnavailableError(Exception):
+    """Raised when no job worker process is running (e.g. the model failed to load)"""
+
+
+class JobStore:
+    """
+    Job state in a local SQLite file; inputs and results as JSONL files on disk.
+    Shared by the API process and the worker processes (each opens its own connection).
+    """
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.db_path = os.path.join(data_dir, "jobs.db")
+        os.makedirs(data_dir, exist_ok=True)
+
+    def _connect(self):
+        # Autocommit mode, transactions are opened explicitly where needed
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def init_db(self):
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    total INTEGER NOT NULL,
+                    processed INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            # Inputs are kept until a job is done, so interrupted jobs can simply be rerun
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', processed = 0, updated_at = ? WHERE status = 'running'",
+                (time.time(),),
+            )
+
+    def update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{k} = ?" for k in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def input_path(self, job_id):
+        return os.path.join(self.data_dir, f"{job_id}.input.jsonl")
+
+    def results_path(self, job_id):
+        return os.path.join(self.data_dir, f"{job_id}.results.jsonl")
+
+    def create(self, texts, max_pending):
+        """Persists the texts and inserts a queued job, unless max_pending jobs are already waiting"""
+        job_id = uuid.uuid4().hex
+        total = 0
+        with open(self.input_path(job_id), "w", encoding="utf-8") as f:
+            for text in texts:
+                f.write(json.dumps(text if isinstance(text, str) else "") + "\n")
+                total += 1
+
+        now = time.time()
+        conn = self._connect()
+        try:
+            # IMMEDIATE takes the write lock, so the count and insert are atomic
+            conn.execute("BEGIN IMMEDIATE")
+            (pending,) = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()
+            if pending >= max_pending:
+                conn.execute("ROLLBACK")
+                os.remove(self.input_path(job_id))
+                raise QueueFullError("Job queue is full, try again later")
+            conn.execute(
+                "INSERT INTO jobs (id, status, total, processed, created_at, updated_at) "
+                "VALUES (?, 'queued', ?, 0, ?, ?)",
+                (job_id, total, now, now),
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+        return job_id
+
+    def claim_next(self):
+        """Atomically moves the oldest queued job to running. Returns its ID or None."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?",
+                    (time.time(), row[0]),
+                )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def status(self, job_id):
+        """Returns the job record as a dict, or None if unknown"""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def results(self, job_id, offset=0, limit=100):
+        """
+        Reads one page of results from disk. Only rows already counted in
+        'processed' are read: those are flushed, while the batch being written
+        may still have a partial last line.
+        """
+        job = self.status(job_id)
+        path = self.results_path(job_id)
+        if not job or not os.path.exists(path):
+            return []
+        stop = min(offset + limit, job["processed"])
+        if stop <= offset:
+            return []
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in islice(f, offset, stop)]
+
+
+class JobQueue:
+    """
+    Bounded queue for large offline scoring jobs.
+
+    Jobs are executed by separate worker processes that poll the SQLite store,
+    so CPU-bound preprocessing and prediction never hold the API process' GIL
+    and interactive /predict latency is not affected. When max_pending jobs
+    are waiting, submit() raises QueueFullError so the API can push back (HTTP 429).
+    """
+
+    def __init__(self, model_path, data_dir, workers=1, max_pending=8, batch_size=256, poll_interval=1.0):
+        self.max_pending = max_pending
+        self.store = JobStore(data_dir)
+        self.store.init_db()
+
+        # spawn: don't fork the (threaded) uvicorn process
+        ctx = multiprocessing.get_context("spawn")
+        self.processes = [
+            ctx.Process(
+                target=run_worker,
+                args=(model_path, data_dir, batch_size, poll_interval),
+                name=f"job-worker-{i}",
+                daemon=True,
+            )
+            for i in range(workers)
+        ]
+        for p in self.processes:
+            p.start()
+
+    def workers_alive(self):
+        return any(p.is_alive() for p in self.processes)
+
+    def submit(self, texts):
+        """Persists the texts and enqueues a new job. Returns the job ID."""
+        if not self.workers_alive():
+            raise WorkersUnavailableError("No job worker is running")
+        return self.store.create(texts, self.max_pending)
+
+    def status(self, job_id):
+        job = self.store.status(job_id)
+        # Without workers a pending job would never finish, so report it as failed
+        if job and job["status"] in ("queued", "running") and not self.workers_alive():
+            self.store.update(job_id, status="failed", error="No job worker is running")
+            job = self.store.status(job_id)
+        return job
+
+    def results(self, job_id, offset=0, limit=100):
+        return self.store.results(job_id, offset=offset, limit=limit)
+
+
+# --- WORKER PROCESS ---
+def run_worker(model_path, data_dir, batch_size, poll_interval):
+    """Entry point of a job worker process: loads its own model and polls for jobs"""
+    logging.basicConfig(level=logging.INFO)
+    try:
+        model = joblib.load(model_path)
+    except Exception as e:
+        # Exit before claiming anything; the API sees no live worker and rejects jobs
+        logger.error(f"Job worker failed to load model: {e}")
+        return
+    store = JobStore(data_dir)
+
+    while True:
+        job_id = store.claim_next()
+        if job_id is None:
+            time.sleep(poll_interval)
+            continue
+        try:
+            run_job(store, model, job_id, batch_size)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            store.update(job_id, status="failed", error=str(e))
+
+
+def run_job(store, model, job_id, batch_size):
+    processed = 0
+
+    with open(store.input_path(job_id), encoding="utf-8") as fin, \
+            open(store.results_path(job_id), "w", encoding="utf-8") as fout:
+        while True:
+            batch = [json.loads(line) for line in islice(fin, batch_size)]
+            if not batch:
+                break
+
+            processed_texts = [full_preprocess(text) for text in batch]
+            predictions = model.predict(processed_texts)
+
+            for text, prediction in zip(batch, predictions):
+                fout.write(json.dumps({"index": processed, "text": text, "sentiment": str(prediction)}) + "\n")
+                processed += 1
+            fout.flush()
+
+            # Count rows only after they are flushed, results() relies on this
+            store.update(job_id, processed=processed)
+
+    store.update(job_id, status="done", processed=processed)
+    os.remove(store.input_path(job_id))
@@ -1,9 +1,10 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, UploadFile, File
 from pydantic import BaseModel
 import joblib
 import os
 import pandas as pd
-from pipe import full_preprocess, crawl_reddit_live, translate_text
+from pipe import full_preprocess, crawl_reddit_live, translate_text, predict_with_scores
+from jobs import JobQueue, QueueFullError, WorkersUnavailableError
 import logging
 
 app = FastAPI()
@@ -24,9 +25,59 @@ except Exception as e:
     logger.error(f"Failed to load model: {e}")
     model_pipeline = None
 
+# Offline Job Queue
+# Jobs run in separate worker processes (each loads its own model),
+# so they don't compete with /predict for this process' GIL
+JOBS_DIR = os.getenv("JOBS_DIR", "jobs")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "8"))
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "256"))
+job_queue = None
+if model_pipeline:
+    job_queue = JobQueue(
+        MODEL_PATH,
+        JOBS_DIR,
+        workers=JOB_WORKERS,
+        max_pending=JOB_MAX_PENDING,
+        batch_size=JOB_BATCH_SIZE,
+    )
+
 
 class PredictionRequest(BaseModel):
     text: str
+    # Optional scoring mode: per-class margins, (uncalibrated) softmax scores
+    # and a review flag when a Depression/Suicidal margin reaches review_margin
+    return_scores: bool = False
+    return_softmax: bool = False
+    review_margin: float | None = None
+    top_k: int | None = None
+
+
+class BatchPredictionRequest(BaseModel):
+    texts: list[str]
+    return_scores: bool = False
+    return_softmax: bool = False
+    review_margin: float | None = None
+    top_k: int | None = None
+
+
+class JobRequest(BaseModel):
+    texts: list[str]
+
+
+def score_texts(processed_texts, request):
+    """Runs a single decision_function pass and shapes results for the request"""
+    results = predict_with_scores(
+        model_pipeline,
+        processed_texts,
+        return_softmax=request.return_softmax,
+        review_margin=request.review_margin,
+        top_k=request.top_k,
+    )
+    if not request.return_scores:
+        for result in results:
+            result.pop("scores")
+    return results
 
 
 @app.get("/")
@@ -44,9 +95,89 @@ def predict_sentiment(request: PredictionRequest):
 
     # 2. Predict
     # Scikit-learn pipeline expects iterable
-    prediction = model_pipeline.predict([processed_text])[0]
+    result = score_texts([processed_text], request)[0]
+
+    return {"text": request.text, "processed": processed_text, **result}
+
+
+@app.post("/predict_batch")
+def predict_sentiment_batch(request: BatchPredictionRequest):
+    if not model_pipeline:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+
+    # 1. Preprocess
+    processed_texts = [full_preprocess(text) for text in request.texts]
+    if not processed_texts:
+        return {"data": []}
+
+    # 2. Predict (one vectorize + dot product for the whole batch)
+    results = score_texts(processed_texts, request)
+
+    return {
+        "data": [
+            {"text": text, "processed": processed, **result}
+            for text, processed, result in zip(request.texts, processed_texts, results)
+        ]
+    }
+
+
+def submit_job(texts):
+    if not job_queue:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    try:
+        job_id = job_queue.submit(texts)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except WorkersUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return job_queue.status(job_id)
 
-    return {"text": request.text, "processed": processed_text, "sentiment": prediction}
+
+@app.post("/jobs")
+def create_job(request: JobRequest):
+    return submit_job(request.texts)
+
+
+@app.post("/jobs/upload")
+def create_job_from_file(file: UploadFile = File(...)):
+    """
+    Accepts a CSV (uses 'translated_text', 'text' or 'full_text' column)
+    or a plain text file with one text per line.
+    """
+    if file.filename and file.filename.endswith(".csv"):
+        df = pd.read_csv(file.file)
+        column = next((c for c in ["translated_text", "text", "full_text"] if c in df.columns), None)
+        if column is None:
+            raise HTTPException(status_code=400, detail="CSV needs a 'translated_text', 'text' or 'full_text' column")
+        texts = df[column].fillna("").astype(str)
+    else:
+        texts = (line.decode("utf-8", errors="ignore").rstrip("\r\n") for line in file.file)
+    return submit_job(texts)
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    if not job_queue:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    job = job_queue.status(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/jobs/{job_id}/results")
+def get_job_results(job_id: str, offset: int = 0, limit: int = 100):
+    job = get_job(job_id)
+    offset = max(0, offset)
+    limit = max(1, min(limit, 1000))
+    data = job_queue.results(job_id, offset=offset, limit=limit)
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "offset": offset,
+        "limit": limit,
+        "data": data,
+    }
 
 
 @app.get("/crawl_live")
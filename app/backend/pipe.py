@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import requests
 import joblib
@@ -86,6 +87,60 @@ def full_preprocess(text):
     processed = remove_stop_words(processed)
     return processed
 
+# --- INFERENCE FUNCTIONS ---
+# Classes that should be routed to a human reviewer when their margin is high enough
+REVIEW_LABELS = ["Depression", "Suicidal"]
+
+def softmax(scores):
+    """Row-wise softmax over decision scores"""
+    z = scores - scores.max(axis=1, keepdims=True)
+    exp = np.exp(z)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+def predict_with_scores(model, processed_texts, return_softmax=False,
+                        review_margin=None, top_k=None):
+    """
+    Label, per-class scores and optional softmax scores from a single
+    decision_function pass (one TF-IDF transform + one sparse dot product).
+
+    LinearSVC's predict() is just argmax over decision_function(), so the label
+    is derived from the same score matrix instead of calling the model twice.
+    With return_softmax=True the margins are also normalised with a softmax;
+    these are NOT calibrated probabilities (LinearSVC has no probability model),
+    only a 0-1 view of the same ranking. If review_margin is set, a post is
+    flagged for human review when the raw decision margin of any REVIEW_LABELS
+    class reaches it.
+    """
+    scores = np.asarray(model.decision_function(processed_texts), dtype=float)
+    classes = np.asarray(model.classes_)
+
+    # Binary models return a single column (score of classes_[1])
+    if scores.ndim == 1:
+        scores = np.column_stack([-scores, scores])
+
+    labels = classes[scores.argmax(axis=1)]
+    soft = softmax(scores) if return_softmax else None
+
+    review_idx = [i for i, c in enumerate(classes) if c in REVIEW_LABELS]
+    k = len(classes) if top_k is None else max(1, min(top_k, len(classes)))
+
+    results = []
+    for i, label in enumerate(labels):
+        order = np.argsort(-scores[i])[:k]
+        result = {
+            "sentiment": str(label),
+            "scores": {str(classes[j]): float(scores[i, j]) for j in order},
+        }
+        if return_softmax:
+            result["softmax_scores"] = {str(classes[j]): float(soft[i, j]) for j in order}
+        if review_margin is not None:
+            result["needs_review"] = bool(
+                review_idx and scores[i, review_idx].max() >= review_margin
+            )
+        results.append(result)
+
+    return results
+
 # --- CRAWL FUNCTIONS (Adapted from app_v2/crawl.py) ---
 SEARCH_KEYWORDS = ["thi", "đồ án", "nợ môn", "học lại", "ra trường", "áp lực học", "rớt môn"]
 ACADEMIC_KEYWORDS = [
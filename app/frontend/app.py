@@ -4,6 +4,7 @@ import requests
 import plotly.express as px
 import time
 import os
+from rollups import FREQS, build_rollups, slice_rollup, sum_by, split_by_sentiment, latest_rows
 
 # Configuration
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
@@ -14,9 +15,26 @@ st.set_page_config(page_title="Student Sentiment Dashboard", layout="wide")
 st.title("Student Sentiment Analysis Dashboard")
 st.markdown("Monitoring mental health trends & academic pressure on Social Media (Reddit).")
 
+SENTIMENT_COLORS = {
+    'Normal': '#2ecc71',
+    'Depression': '#3498db',
+    'Suicidal': '#e74c3c'
+}
+
+TREND_TITLES = {'Day': 'Daily', 'Week': 'Weekly', 'Month': 'Monthly'}
+
 # --- 1. Load Historical Data ---
-@st.cache_data
-def load_data():
+def get_data_version():
+    """File mtime, used as cache key so rollups are rebuilt only when data changes"""
+    try:
+        return os.path.getmtime(DATA_FILE)
+    except OSError:
+        return None
+
+# cache_resource hands out the same object instead of unpickling a copy on every
+# rerun; these objects are read-only. max_entries=1 drops the previous data version.
+@st.cache_resource(max_entries=1)
+def load_data(data_version):
     try:
         df = pd.read_csv(DATA_FILE)
         df['date_readable'] = pd.to_datetime(df['date_readable'])
@@ -24,7 +42,46 @@ def load_data():
     except FileNotFoundError:
         return pd.DataFrame()
 
-df = load_data()
+@st.cache_resource(max_entries=1)
+def get_rollups(data_version):
+    return build_rollups(load_data(data_version))
+
+@st.cache_resource(max_entries=1)
+def get_explorer(data_version):
+    """Date bounds and per-sentiment sorted frames for the raw data explorer"""
+    df = load_data(data_version)
+    return {
+        'min_date': df['date_readable'].min().date(),
+        'max_date': df['date_readable'].max().date(),
+        'frames': split_by_sentiment(df, ['date_readable', 'sentiment', 'full_text']),
+    }
+
+# Charts are cached per (data version, filters) so reruns reuse the figures
+CHART_CACHE_ENTRIES = 64
+
+@st.cache_data(max_entries=CHART_CACHE_ENTRIES)
+def pie_chart(data_version, start, end, sentiments):
+    dist = sum_by(slice_rollup(get_rollups(data_version), 'Day', start, end, sentiments), ['sentiment'])
+    return px.pie(dist, names='sentiment', values='count', title='Overall Sentiment Split',
+                  color='sentiment', color_discrete_map=SENTIMENT_COLORS)
+
+@st.cache_data(max_entries=CHART_CACHE_ENTRIES)
+def trend_chart(data_version, granularity, start, end, sentiments):
+    trend_df = sum_by(slice_rollup(get_rollups(data_version), granularity, start, end, sentiments),
+                      ['period', 'sentiment'])
+    return px.line(trend_df, x='period', y='count', color='sentiment',
+                   title='Sentiment Trends Over Time', markers=True,
+                   color_discrete_map=SENTIMENT_COLORS)
+
+@st.cache_data(max_entries=CHART_CACHE_ENTRIES)
+def subreddit_chart(data_version, start, end, sentiments):
+    by_sub = sum_by(slice_rollup(get_rollups(data_version), 'Day', start, end, sentiments),
+                    ['subreddit', 'sentiment'])
+    return px.bar(by_sub, x='subreddit', y='count', color='sentiment',
+                  title='Sentiment by Subreddit', color_discrete_map=SENTIMENT_COLORS)
+
+data_version = get_data_version()
+df = load_data(data_version)
 
 # --- 2. Live Fetch Control ---
 col1, col2 = st.columns([3, 1])
@@ -59,44 +116,46 @@ with col2:
 
 # --- 3. Dashboard Visualization ---
 if not df.empty:
-    # A. Sentiment Distribution
+    # Filters (applied to precomputed rollups, not the full data)
     st.markdown("---")
+    sentiment_options = ['Normal', 'Depression', 'Suicidal']
+    explorer = get_explorer(data_version)
+    min_date, max_date = explorer['min_date'], explorer['max_date']
+
+    f1, f2, f3 = st.columns([2, 2, 1])
+    with f1:
+        date_range = st.date_input("Date Range", value=(min_date, max_date),
+                                   min_value=min_date, max_value=max_date)
+    with f2:
+        selected_sentiments = st.multiselect("Filter by Sentiment", options=sentiment_options, default=sentiment_options)
+    with f3:
+        granularity = st.radio("Granularity", options=list(FREQS), index=2, horizontal=True)
+
+    # date_input returns a single date while the user is still picking the range
+    start = date_range[0] if date_range else min_date
+    end = date_range[1] if len(date_range) > 1 else max_date
+    sentiments = tuple(selected_sentiments)
+
+    # A. Sentiment Distribution
     c1, c2 = st.columns(2)
     
     with c1:
         st.write("#### Sentiment Distribution")
-        fig_pie = px.pie(df, names='sentiment', title='Overall Sentiment Split', 
-                         color='sentiment',
-                         color_discrete_map={
-                             'Normal': '#2ecc71',
-                             'Depression': '#3498db', 
-                             'Suicidal': '#e74c3c'
-                         })
-        st.plotly_chart(fig_pie, use_container_width=True)
+        st.plotly_chart(pie_chart(data_version, start, end, sentiments), use_container_width=True)
         
     with c2:
-        st.write("#### Monthly Trend")
-        # Ensure date column
-        if 'date_readable' in df.columns:
-            df['month_year'] = df['date_readable'].dt.to_period('M').astype(str)
-            trend_df = df.groupby(['month_year', 'sentiment']).size().reset_index(name='count')
-            
-            fig_line = px.line(trend_df, x='month_year', y='count', color='sentiment', 
-                               title='Sentiment Trends Over Time',
-                               markers=True)
-            st.plotly_chart(fig_line, use_container_width=True)
+        st.write(f"#### {TREND_TITLES[granularity]} Trend")
+        st.plotly_chart(trend_chart(data_version, granularity, start, end, sentiments), use_container_width=True)
+
+    if 'subreddit' in df.columns:
+        st.write("#### Subreddit Breakdown")
+        st.plotly_chart(subreddit_chart(data_version, start, end, sentiments), use_container_width=True)
             
     # B. Detailed View
     st.markdown("---")
     st.write("#### Raw Data Explorer")
 
-    # Filter by Sentiment
-    sentiment_options = ['Normal', 'Depression', 'Suicidal']
-    selected_sentiments = st.multiselect("Filter by Sentiment", options=sentiment_options, default=sentiment_options)
-    
-    filtered_df = df[df['sentiment'].isin(selected_sentiments)]
-    
-    st.dataframe(filtered_df[['date_readable', 'sentiment', 'full_text']].sort_values('date_readable', ascending=False).head(500))
+    st.dataframe(latest_rows(explorer['frames'], start, end, sentiments, n=500))
     
 else:
     st.warning("Processed data not found. Please run the setup script.")
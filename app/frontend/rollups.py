@@ -0,0 +1,99 @@
+import pandas as pd
+
+# Granularities offered on the dashboard (label -> pandas period alias)
+FREQS = {"Day": "D", "Week": "W", "Month": "M"}
+
+# Dimensions kept in every rollup (only those present in the data are used)
+DIMENSIONS = ["sentiment", "subreddit"]
+
+
+def build_rollups(df):
+    """
+    Pre-aggregates post counts per period x sentiment x subreddit for every
+    granularity in FREQS. Runs once per data version; the dashboard then only
+    slices these small tables instead of grouping the full dataset.
+    """
+    dims = [c for c in DIMENSIONS if c in df.columns]
+    rollups = {}
+    for name, freq in FREQS.items():
+        period = df["date_readable"].dt.to_period(freq).dt.start_time.rename("period")
+        rollups[name] = (
+            df.groupby([period, *dims], dropna=False)
+            .size()
+            .reset_index(name="count")
+            .sort_values("period", ignore_index=True)
+        )
+    return rollups
+
+
+def _filter(rollup, start=None, end=None, sentiments=None):
+    """Filters rollup rows by period start and sentiment"""
+    mask = pd.Series(True, index=rollup.index)
+    if start is not None:
+        mask &= rollup["period"] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= rollup["period"] <= pd.Timestamp(end)
+    if sentiments is not None:
+        mask &= rollup["sentiment"].isin(sentiments)
+    return rollup[mask]
+
+
+def slice_rollup(rollups, granularity, start=None, end=None, sentiments=None):
+    """
+    Rows of the `granularity` rollup covering the dates start..end (inclusive).
+
+    Periods fully inside the range come straight from the precomputed rollup.
+    The first/last period, when only partly inside the range, is rebuilt from
+    the Day rows within the range, so totals always match the Day rollup.
+    """
+    days = _filter(rollups["Day"], start, end, sentiments)
+    if granularity == "Day":
+        return days
+
+    freq = FREQS[granularity]
+    periods = rollups[granularity]["period"].dt.to_period(freq)
+    full = pd.Series(True, index=periods.index)
+    if start is not None:
+        full &= periods.dt.start_time >= pd.Timestamp(start)
+    if end is not None:
+        full &= periods.dt.end_time.dt.normalize() <= pd.Timestamp(end)
+    full_periods = rollups[granularity]["period"][full]
+    full_rows = _filter(rollups[granularity][full], sentiments=sentiments)
+
+    # Day rows whose period is not fully covered, re-bucketed into that period
+    day_periods = days["period"].dt.to_period(freq).dt.start_time
+    partial = days[~day_periods.isin(full_periods)]
+    partial = partial.assign(period=day_periods[partial.index])
+
+    return pd.concat([full_rows, partial], ignore_index=True)
+
+
+def sum_by(rollup, columns):
+    """Re-aggregates a (sliced) rollup over the given columns"""
+    return rollup.groupby(columns, dropna=False)["count"].sum().reset_index()
+
+
+def split_by_sentiment(df, columns):
+    """Date-sorted (ascending) frame per sentiment, for range lookups with searchsorted"""
+    df = df.sort_values("date_readable", kind="stable")
+    return {sentiment: group[columns].reset_index(drop=True) for sentiment, group in df.groupby("sentiment")}
+
+
+def latest_rows(frames, start, end, sentiments, n=500):
+    """
+    Newest n rows dated start..end (inclusive) for the given sentiments.
+    Each per-sentiment frame is sliced with searchsorted, so only the n last
+    rows of every range are touched, not the whole dataset.
+    """
+    lo_ts, hi_ts = pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(days=1)
+    parts = []
+    for sentiment in sentiments:
+        frame = frames.get(sentiment)
+        if frame is None:
+            continue
+        lo = frame["date_readable"].searchsorted(lo_ts, side="left")
+        hi = frame["date_readable"].searchsorted(hi_ts, side="left")
+        parts.append(frame.iloc[max(lo, hi - n):hi])
+    if not parts:
+        return pd.DataFrame()
+    return pd.concat(parts).sort_values("date_readable", ascending=False).head(n)
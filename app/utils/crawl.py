@@ -2,6 +2,17 @@ import requests
 import pandas as pd
 import time
 import random
+import os
+
+# Chạy được cả dạng script (python crawl.py) lẫn module (python -m app.utils.crawl)
+try:
+    from .dedup import NearDuplicateIndex
+except ImportError:
+    from dedup import NearDuplicateIndex
+
+# Đường dẫn tính theo vị trí file này (app/data), không phụ thuộc thư mục đang chạy
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+OUTPUT_FILE = os.path.join(DATA_DIR, "voz_data_filtered.csv")
 
 # --- CẤU HÌNH BỘ LỌC (QUAN TRỌNG NHẤT) ---
 
@@ -70,10 +81,64 @@ def strict_filter(text):
             
     return is_academic
 
+REQUEST_TIMEOUT = 10 # giây, tránh 1 request treo làm kẹt cả quá trình crawl
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+
+def search_reddit(sub, keyword):
+    """
+    Gọi API search của Reddit cho 1 cặp (subreddit, từ khóa).
+    Trả về (số bài API trả về, danh sách bài đã qua strict_filter).
+    """
+    url = f"https://www.reddit.com/r/{sub}/search.json"
+    params = {
+        'q': keyword,
+        'restrict_sr': '1',
+        'limit': 100, # Lấy tối đa mỗi lần
+        'sort': 'relevance', # Lấy bài liên quan nhất thay vì mới nhất
+        't': 'all' # Tìm trong tất cả thời gian
+    }
+    
+    response = requests.get(url, headers=HEADERS, params=params, timeout=REQUEST_TIMEOUT)
+    
+    if response.status_code != 200:
+        print(f"    Lỗi kết nối: {response.status_code}")
+        return 0, []
+        
+    data = response.json()
+    
+    if 'data' not in data or 'children' not in data['data']:
+        return 0, []
+
+    posts = []
+    for item in data['data']['children']:
+        post = item['data']
+        
+        # Gộp tiêu đề và nội dung để kiểm tra
+        full_text = f"{post['title']} {post['selftext']}"
+        
+        # --- BƯỚC LỌC QUAN TRỌNG ---
+        if strict_filter(full_text):
+            posts.append({
+                'id': post['id'],
+                'created_utc': post['created_utc'],
+                'date_readable': pd.to_datetime(post['created_utc'], unit='s'),
+                'title': post['title'],
+                'content': post['selftext'],
+                'full_text': full_text, # Lưu cái này để lát nữa dịch
+                'score': post['score'],
+                'subreddit': sub,
+                'url': post['url']
+            })
+    
+    return len(data['data']['children']), posts
+
 def crawl_reddit_strict(subreddits=["vozforums", "TroChuyenLinhTinh", "VietNam"]):
     all_posts = {} # Dùng dict để tránh trùng lặp bài viết (theo ID)
     
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+    # Index MinHash/LSH lưu giữa các lần crawl để phát hiện bài gần trùng (repost, copy-paste)
+    dup_index = NearDuplicateIndex.load()
+    count_dup = 0
+    count_recrawled = 0
 
     print(f"Bắt đầu quy trình quét sâu...")
     
@@ -82,50 +147,25 @@ def crawl_reddit_strict(subreddits=["vozforums", "TroChuyenLinhTinh", "VietNam"]
             print(f" -> Đang quét: r/{sub} | Từ khóa: '{keyword}'")
             
             try:
-                url = f"https://www.reddit.com/r/{sub}/search.json"
-                params = {
-                    'q': keyword,
-                    'restrict_sr': '1',
-                    'limit': 100, # Lấy tối đa mỗi lần
-                    'sort': 'relevance', # Lấy bài liên quan nhất thay vì mới nhất
-                    't': 'all' # Tìm trong tất cả thời gian
-                }
-                
-                response = requests.get(url, headers=headers, params=params)
-                
-                if response.status_code != 200:
-                    print(f"    Lỗi kết nối: {response.status_code}")
-                    continue
-                    
-                data = response.json()
-                
-                if 'data' not in data or 'children' not in data['data']:
-                    continue
+                count_found, posts = search_reddit(sub, keyword)
 
                 count_added = 0
-                for item in data['data']['children']:
-                    post = item['data']
-                    post_id = post['id']
+                for post in posts:
+                    if post['id'] in all_posts:
+                        continue
                     
-                    # Gộp tiêu đề và nội dung để kiểm tra
-                    full_text = f"{post['title']} {post['selftext']}"
+                    # Bài gần trùng sẽ dùng lại bản dịch và kết quả dự đoán của bài gốc
+                    # (check() trả về chính id nếu bài đã có trong index từ lần crawl trước)
+                    post['duplicate_of'] = dup_index.check(post['id'], post['full_text'])
+                    if post['duplicate_of'] == post['id']:
+                        count_recrawled += 1
+                    elif post['duplicate_of'] is not None:
+                        count_dup += 1
                     
-                    # --- BƯỚC LỌC QUAN TRỌNG ---
-                    if post_id not in all_posts and strict_filter(full_text):
-                        all_posts[post_id] = {
-                            'id': post_id,
-                            'created_utc': post['created_utc'],
-                            'date_readable': pd.to_datetime(post['created_utc'], unit='s'),
-                            'title': post['title'],
-                            'content': post['selftext'],
-                            'full_text': full_text, # Lưu cái này để lát nữa dịch
-                            'score': post['score'],
-                            'subreddit': sub,
-                            'url': post['url']
-                        }
-                        count_added += 1
+                    all_posts[post['id']] = post
+                    count_added += 1
                 
-                print(f"    -> Tìm thấy {len(data['data']['children'])} bài, Lọc được: {count_added} bài chuẩn.")
+                print(f"    -> Tìm thấy {count_found} bài, Lọc được: {count_added} bài chuẩn.")
                 
                 # Nghỉ tay xíu để Reddit không chặn IP
                 time.sleep(random.uniform(1, 2))
@@ -133,22 +173,27 @@ def crawl_reddit_strict(subreddits=["vozforums", "TroChuyenLinhTinh", "VietNam"]
             except Exception as e:
                 print(f"    Lỗi: {e}")
 
+    dup_index.save()
+    print(f"Phát hiện {count_dup} bài gần trùng, {count_recrawled} bài đã crawl trước đó (sẽ không dịch/dự đoán lại).")
+    
     # Chuyển về DataFrame
     df = pd.DataFrame(list(all_posts.values()))
     return df
 
 # --- CHẠY SCRIPT ---
-df_final = crawl_reddit_strict()
-
-# Hiển thị kết quả
-if not df_final.empty:
-    print("\n" + "="*50)
-    print(f"TỔNG KẾT: Đã thu thập được {len(df_final)} bài chất lượng cao.")
-    print("="*50)
-    print(df_final[['title', 'date_readable']].head(10))
+if __name__ == "__main__":
+    df_final = crawl_reddit_strict()
+
+    # Hiển thị kết quả
+    if not df_final.empty:
+        print("\n" + "="*50)
+        print(f"TỔNG KẾT: Đã thu thập được {len(df_final)} bài chất lượng cao.")
+        print("="*50)
+        print(df_final[['title', 'date_readable']].head(10))
     
-    # Lưu file
-    df_final.to_csv(".data/voz_data_filtered.csv", index=False, encoding='utf-8-sig')
-    print("\nĐã lưu file: .data/voz_data_filtered.csv")
-else:
-    print("Không tìm thấy bài nào thỏa mãn bộ lọc nghiêm ngặt này.")
\ No newline at end of file
+        # Lưu file
+        os.makedirs(DATA_DIR, exist_ok=True)
+        df_final.to_csv(OUTPUT_FILE, index=False, encoding='utf-8-sig')
+        print(f"\nĐã lưu file: {OUTPUT_FILE}")
+    else:
+        print("Không tìm thấy bài nào thỏa mãn bộ lọc nghiêm ngặt này.")
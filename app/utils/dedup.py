@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import random
+import re
+import unicodedata
+
+# --- CẤU HÌNH ---
+# Index được lưu cạnh dữ liệu (app/data), không phụ thuộc thư mục đang chạy
+DEFAULT_INDEX_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "near_dup_index.json")
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+def normalize_text(text):
+    """Chuẩn hoá full_text trước khi so trùng: bỏ link, dấu câu, khoảng trắng thừa"""
+    if not isinstance(text, str): return ""
+    text = unicodedata.normalize("NFC", text).lower()
+    text = re.sub(r"https?:\/\/\S+|www\.\S+", " ", text)
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def shingles(text, k=3):
+    """Tập các cụm k từ liên tiếp (word shingles)"""
+    words = normalize_text(text).split()
+    if len(words) <= k:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def in_batch_duplicates(df):
+    """Mask các dòng có 'duplicate_of' trỏ tới một bài gốc khác nằm trong cùng df"""
+    return df['duplicate_of'].isin(df['id']) & (df['duplicate_of'] != df['id'])
+
+
+def copy_from_originals(df, columns, mask):
+    """Copy kết quả (columns) từ bài gốc sang các dòng trùng được chọn bởi mask"""
+    originals = df.drop_duplicates('id').set_index('id')
+    for col in columns:
+        df.loc[mask, col] = df.loc[mask, 'duplicate_of'].map(originals[col])
+
+
+class NearDuplicateIndex:
+    """
+    MinHash + LSH index để phát hiện bài đăng gần trùng (repost, cross-post, copy-paste).
+
+    Mỗi bài được lưu kèm signature và kết quả đã tính (translated_text, sentiment),
+    để bài trùng dùng lại thay vì dịch/dự đoán lại. Index được lưu ra JSON giữa các lần crawl.
+    """
+
+    def __init__(self, num_perm=64, bands=16, threshold=0.8, seed=42):
+        assert num_perm % bands == 0, "num_perm phải chia hết cho bands"
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.seed = seed
+
+        rng = random.Random(seed)
+        self.perms = [
+            (rng.randint(1, MERSENNE_PRIME - 1), rng.randint(0, MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+        self.posts = {}    # post_id -> {"signature": [...], "translated_text": ..., "sentiment": ...}
+        self.buckets = {}  # (band, band_hash) -> [post_id, ...]
+
+    # --- MINHASH ---
+    def signature(self, text):
+        hashes = [
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+            for s in shingles(text)
+        ]
+        if not hashes:
+            return [MAX_HASH] * self.num_perm
+        return [min(((a * h + b) % MERSENNE_PRIME) & MAX_HASH for h in hashes) for a, b in self.perms]
+
+    def similarity(self, sig_a, sig_b):
+        """Ước lượng Jaccard từ hai signature"""
+        return sum(x == y for x, y in zip(sig_a, sig_b)) / self.num_perm
+
+    def _band_keys(self, sig):
+        for band in range(self.bands):
+            chunk = sig[band * self.rows:(band + 1) * self.rows]
+            yield (band, hash(tuple(chunk)))
+
+    # --- TRA CỨU / THÊM ---
+    def query(self, sig):
+        """Trả về post_id giống nhất (>= threshold) hoặc None"""
+        candidates = set()
+        for key in self._band_keys(sig):
+            candidates.update(self.buckets.get(key, ()))
+
+        best_id, best_score = None, self.threshold
+        for post_id in candidates:
+            score = self.similarity(sig, self.posts[post_id]["signature"])
+            if score >= best_score:
+                best_id, best_score = post_id, score
+        return best_id
+
+    def add(self, post_id, sig):
+        if post_id in self.posts: return
+        self.posts[post_id] = {"signature": sig}
+        for key in self._band_keys(sig):
+            self.buckets.setdefault(key, []).append(post_id)
+
+    def check(self, post_id, text):
+        """
+        Kiểm tra một bài mới: trả về id bài gốc nếu là bài gần trùng,
+        ngược lại thêm bài vào index và trả về None.
+        Bài đã có trong index (crawl lại) trả về chính post_id của nó.
+        """
+        if post_id in self.posts:
+            return post_id
+        sig = self.signature(text)
+        match = self.query(sig)
+        if match is None:
+            self.add(post_id, sig)
+        return match
+
+    # --- KẾT QUẢ ĐÃ TÍNH ---
+    def get_result(self, post_id, field):
+        post = self.posts.get(post_id)
+        return post.get(field) if post else None
+
+    def set_result(self, post_id, **fields):
+        if post_id in self.posts:
+            self.posts[post_id].update(fields)
+
+    # --- LƯU / ĐỌC ---
+    def save(self, path=DEFAULT_INDEX_FILE):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "num_perm": self.num_perm,
+                "bands": self.bands,
+                "threshold": self.threshold,
+                "seed": self.seed,
+                "posts": self.posts,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_FILE, **kwargs):
+        """Đọc index đã lưu; tạo index rỗng nếu chưa có file"""
+        if not os.path.exists(path):
+            return cls(**kwargs)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(num_perm=data["num_perm"], bands=data["bands"],
+                    threshold=data["threshold"], seed=data["seed"])
+        for post_id, post in data["posts"].items():
+            index.add(post_id, post["signature"])
+            index.posts[post_id].update(post)
+        return index
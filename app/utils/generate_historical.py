@@ -3,10 +3,13 @@ import joblib
 import sys
 import os
 from ..backend.pipe import full_preprocess
+from .dedup import NearDuplicateIndex, copy_from_originals, in_batch_duplicates
 
-MODEL_PATH = "../../models/svc_pipeline.pkl"
-INPUT_FILE = "../data/voz_data_english.csv"
-OUTPUT_FILE = "../data/processed_data_final.csv"
+# Paths are relative to this file (app/utils), not the working directory
+UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(UTILS_DIR, "..", "..", "models", "svc_pipeline.pkl")
+INPUT_FILE = os.path.join(UTILS_DIR, "..", "data", "voz_data_english.csv")
+OUTPUT_FILE = os.path.join(UTILS_DIR, "..", "data", "processed_data_final.csv")
 
 def generate():
     print("Loading model...")
@@ -22,7 +25,7 @@ def generate():
         # Create a dummy one for demo structure if missing
         return
 
-    df = pd.read_csv(INPUT_FILE)
+    df = pd.read_csv(INPUT_FILE, dtype={'id': str, 'duplicate_of': str})
     
     # Check needed columns
     if 'translated_text' not in df.columns:
@@ -34,16 +37,44 @@ def generate():
     # We must treat NaN
     df['translated_text'] = df['translated_text'].fillna("")
     
-    # Process
-    df['processed_text'] = df['translated_text'].apply(full_preprocess)
+    # Near-duplicates reuse the sentiment of the post they match
+    dup_index = NearDuplicateIndex.load()
+    if 'duplicate_of' not in df.columns:
+        df['duplicate_of'] = None
+    df['sentiment'] = [
+        dup_index.get_result(dup_id, 'sentiment') if isinstance(dup_id, str) else None
+        for dup_id in df['duplicate_of']
+    ]
+    cached = df['sentiment'].notna()
+    
+    # Duplicates of an original in this same file copy its result after it is predicted
+    in_batch = in_batch_duplicates(df) & ~cached
+    is_new = ~cached & ~in_batch
+    print(f"Reusing predictions for {(cached | in_batch).sum()} near-duplicate posts.")
+    
+    # Process (only new content)
+    df['processed_text'] = ""
+    df.loc[is_new, 'processed_text'] = df.loc[is_new, 'translated_text'].apply(full_preprocess)
     
     # Predict
     # Scikit learn predict takes list or array
-    predictions = model.predict(df['processed_text'].tolist())
+    if is_new.any():
+        predictions = model.predict(df.loc[is_new, 'processed_text'].tolist())
+        df.loc[is_new, 'sentiment'] = predictions
+    copy_from_originals(df, ['processed_text', 'sentiment'], in_batch)
     
-    df['sentiment'] = predictions
+    # Remember new predictions for future crawls
+    for post_id, sentiment in zip(df.loc[is_new, 'id'], df.loc[is_new, 'sentiment']):
+        dup_index.set_result(str(post_id), sentiment=sentiment)
+    dup_index.save()
     
     # Save
+    # Keep rows other runs (e.g. app.utils.ingest) already appended to the output
+    if os.path.exists(OUTPUT_FILE):
+        existing = pd.read_csv(OUTPUT_FILE, dtype={'id': str, 'duplicate_of': str})
+        if 'id' in existing.columns:
+            df = pd.concat([existing[~existing['id'].isin(df['id'])], df], ignore_index=True)
+    
     os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
     df.to_csv(OUTPUT_FILE, index=False)
     print(f"Successfully generated {OUTPUT_FILE} with {len(df)} rows.")
@@ -0,0 +1,395 @@
+"""
+Unified ingest pipeline: crawl -> translate -> predict in one command.
+
+Posts stream through bounded queues between the stages, so translation of
+early posts overlaps crawling of later ones and prediction overlaps
+translation. Paths are resolved relative to this file, not the working dir.
+
+Run from the repo root:
+    python -m app.utils.ingest --translate-workers 4 --predict-workers 1
+"""
+import argparse
+import csv
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+import joblib
+from deep_translator import GoogleTranslator
+
+from ..backend.pipe import full_preprocess
+from .crawl import SEARCH_KEYWORDS, search_reddit
+from .dedup import NearDuplicateIndex
+from .translate import translate_one
+
+UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(UTILS_DIR, "..", "data")
+MODEL_PATH = os.path.join(UTILS_DIR, "..", "..", "models", "svc_pipeline.pkl")
+OUTPUT_FILE = os.path.join(DATA_DIR, "processed_data_final.csv")
+CHECKPOINT_FILE = os.path.join(DATA_DIR, "ingest_checkpoint.txt")
+
+SUBREDDITS = ["vozforums", "TroChuyenLinhTinh", "VietNam"]
+OUTPUT_COLUMNS = [
+    "id", "created_utc", "date_readable", "translated_text", "full_text",
+    "subreddit", "duplicate_of", "processed_text", "sentiment",
+]
+
+# End-of-stream marker passed down the queues
+DONE = object()
+
+
+class StageStats:
+    """Thread-safe item counter + busy time for one stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, count, seconds, failed=0):
+        with self.lock:
+            self.count += count
+            self.failed += failed
+            self.busy += seconds
+
+    def report(self, elapsed):
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        return (f"  {self.name:<10} {self.count:>6} items  {rate:7.2f}/s  "
+                f"busy {self.busy:7.1f}s  failed {self.failed}")
+
+
+class IngestPipeline:
+    def __init__(self, model, subreddits, crawl_workers=1, translate_workers=4,
+                 predict_workers=1, batch_size=32, queue_size=100,
+                 output_file=OUTPUT_FILE, checkpoint_file=CHECKPOINT_FILE,
+                 report_interval=10):
+        self.model = model
+        self.subreddits = subreddits
+        self.crawl_workers = crawl_workers
+        self.translate_workers = translate_workers
+        self.predict_workers = predict_workers
+        self.batch_size = batch_size
+        self.output_file = output_file
+        self.checkpoint_file = checkpoint_file
+        self.report_interval = report_interval
+
+        # Bounded queues give backpressure: a slow stage blocks its producers
+        self.tasks = queue.Queue()
+        self.crawled = queue.Queue(maxsize=queue_size)
+        self.translated = queue.Queue(maxsize=queue_size)
+        self.predicted = queue.Queue(maxsize=queue_size)
+
+        self.stats = {name: StageStats(name) for name in ["crawl", "translate", "predict", "write"]}
+
+        # Near-duplicate index is shared by crawl workers and the writer
+        self.dup_index = NearDuplicateIndex.load()
+        self.index_lock = threading.Lock()
+
+        # Duplicates whose original is still in flight wait here until it is written,
+        # then copy its translation/prediction instead of going through the stages
+        self.in_flight = set()
+        self.held = {}  # original id -> [duplicate posts]
+        self.held_lock = threading.Lock()
+
+        self.done_ids = self._load_checkpoint() | self._load_output_ids()
+        self.seen_ids = set(self.done_ids)
+        self.seen_lock = threading.Lock()
+
+    # --- CHECKPOINT ---
+    def _load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_file):
+            return set()
+        with open(self.checkpoint_file, encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+
+    def _load_output_ids(self):
+        """IDs already in the output file (e.g. written by generate_historical.py)"""
+        if not os.path.exists(self.output_file) or os.path.getsize(self.output_file) == 0:
+            return set()
+        with open(self.output_file, encoding="utf-8-sig", newline="") as f:
+            return {row["id"] for row in csv.DictReader(f) if row.get("id")}
+
+    # --- STAGES ---
+    def _start_stage(self, name, workers, target, out_q, n_downstream):
+        """Starts worker threads; once all exit, sends DONE to each downstream worker"""
+        threads = [threading.Thread(target=target, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+        for t in threads:
+            t.start()
+
+        def close():
+            for t in threads:
+                t.join()
+            for _ in range(n_downstream):
+                out_q.put(DONE)
+
+        threading.Thread(target=close, name=f"{name}-close", daemon=True).start()
+
+    def _crawl_worker(self):
+        while True:
+            task = self.tasks.get()
+            if task is DONE:
+                return
+            sub, keyword = task
+            start = time.perf_counter()
+            posts, failed = [], 0
+            try:
+                _, posts = search_reddit(sub, keyword)
+            except Exception as e:
+                print(f" -> Crawl error r/{sub} '{keyword}': {e}")
+                failed = 1
+
+            emitted, crawled = [], 0
+            for post in posts:
+                with self.seen_lock:
+                    if post["id"] in self.seen_ids:
+                        continue
+                    self.seen_ids.add(post["id"])
+                crawled += 1
+
+                # Near-duplicates carry over the cached translation/prediction of their match
+                with self.index_lock:
+                    dup_id = self.dup_index.check(post["id"], post["full_text"])
+                    post["duplicate_of"] = dup_id
+                    if dup_id is not None:
+                        post["translated_text"] = self.dup_index.get_result(dup_id, "translated_text")
+                        post["sentiment"] = self.dup_index.get_result(dup_id, "sentiment")
+
+                with self.held_lock:
+                    if dup_id is not None and dup_id != post["id"] and dup_id in self.in_flight:
+                        self.held.setdefault(dup_id, []).append(post)
+                        continue
+                    self.in_flight.add(post["id"])
+                emitted.append(post)
+
+            self.stats["crawl"].record(crawled, time.perf_counter() - start, failed)
+            for post in emitted:
+                self.crawled.put(post)
+
+            # Be gentle with Reddit rate limits
+            time.sleep(random.uniform(1, 2))
+
+    def _translate_worker(self):
+        # GoogleTranslator holds a session, so each worker gets its own
+        translator = GoogleTranslator(source="vi", target="en")
+        while True:
+            post = self.crawled.get()
+            if post is DONE:
+                return
+            start = time.perf_counter()
+            if not post.get("translated_text"):
+                try:
+                    post["translated_text"] = translate_one(translator, post["full_text"])
+                except Exception as e:
+                    print(f" -> Translation error {post['id']}: {e}")
+                    post["translated_text"] = None
+
+            # Drop failed/empty translations, same as translate.py
+            if not post["translated_text"]:
+                self.stats["translate"].record(0, time.perf_counter() - start, failed=1)
+                # Its held duplicates have nothing to copy, translate them here instead
+                for dup in self._release(post["id"]):
+                    try:
+                        dup["translated_text"] = translate_one(translator, dup["full_text"])
+                    except Exception as e:
+                        print(f" -> Translation error {dup['id']}: {e}")
+                        continue
+                    if dup["translated_text"]:
+                        self.translated.put(dup)
+                continue
+            self.stats["translate"].record(1, time.perf_counter() - start)
+            self.translated.put(post)
+
+    def _predict_worker(self):
+        finished = False
+        while not finished:
+            post = self.translated.get()
+            if post is DONE:
+                return
+
+            # Micro-batch whatever is already waiting, so the model runs on batches
+            batch = [post]
+            while len(batch) < self.batch_size:
+                try:
+                    post = self.translated.get_nowait()
+                except queue.Empty:
+                    break
+                if post is DONE:
+                    finished = True
+                    break
+                batch.append(post)
+
+            while batch:
+                start = time.perf_counter()
+                try:
+                    self._predict(batch)
+                except Exception as e:
+                    print(f" -> Prediction error ({len(batch)} posts): {e}")
+                    self.stats["predict"].record(0, time.perf_counter() - start, failed=len(batch))
+                    # The batch is dropped, but duplicates held for its posts must not be:
+                    # give them the original's translation and try them on their own
+                    retry = []
+                    for p in batch:
+                        for dup in self._release(p["id"]):
+                            dup["translated_text"] = p["translated_text"]
+                            retry.append(dup)
+                    batch = retry
+                    continue
+
+                self.stats["predict"].record(len(batch), time.perf_counter() - start)
+                for p in batch:
+                    self.predicted.put(p)
+                break
+
+    def _predict(self, batch):
+        """Preprocesses and predicts the posts that don't have a (cached) sentiment yet"""
+        new_posts = [p for p in batch if not p.get("sentiment")]
+        if not new_posts:
+            return
+        processed = [full_preprocess(p["translated_text"]) for p in new_posts]
+        predictions = self.model.predict(processed)
+        for p, text, sentiment in zip(new_posts, processed, predictions):
+            p["processed_text"] = text
+            p["sentiment"] = str(sentiment)
+
+    def _release(self, post_id):
+        """Marks a post as no longer in flight and returns its held duplicates"""
+        with self.held_lock:
+            self.in_flight.discard(post_id)
+            return self.held.pop(post_id, [])
+
+    # --- WRITER ---
+    def _output_columns(self):
+        """Reuse the header of an existing output file so appended rows line up"""
+        if os.path.exists(self.output_file) and os.path.getsize(self.output_file) > 0:
+            with open(self.output_file, encoding="utf-8-sig", newline="") as f:
+                return next(csv.reader(f))
+        return OUTPUT_COLUMNS
+
+    def _write_results(self, started):
+        os.makedirs(os.path.dirname(self.output_file), exist_ok=True)
+        columns = self._output_columns()
+        write_header = not os.path.exists(self.output_file) or os.path.getsize(self.output_file) == 0
+
+        # The predict stage closer sends a single DONE once all its workers exit
+        finished = False
+        last_report = time.perf_counter()
+
+        with open(self.output_file, "a", encoding="utf-8", newline="") as out, \
+                open(self.checkpoint_file, "a", encoding="utf-8") as checkpoint:
+            writer = csv.DictWriter(out, fieldnames=columns, extrasaction="ignore", restval="")
+            if write_header:
+                writer.writeheader()
+
+            while not finished:
+                try:
+                    post = self.predicted.get(timeout=1)
+                except queue.Empty:
+                    post = None
+
+                if post is DONE:
+                    finished = True
+                elif post is not None:
+                    start = time.perf_counter()
+                    with self.index_lock:
+                        self.dup_index.set_result(post["id"], translated_text=post["translated_text"],
+                                                  sentiment=post["sentiment"])
+
+                    # Held duplicates copy the original's results and are written right away
+                    rows = [post]
+                    for dup in self._release(post["id"]):
+                        for field in ["translated_text", "processed_text", "sentiment"]:
+                            dup[field] = post.get(field)
+                        rows.append(dup)
+
+                    for row in rows:
+                        row["date_readable"] = str(row["date_readable"])
+                        writer.writerow(row)
+                        checkpoint.write(f"{row['id']}\n")
+                    out.flush()
+                    checkpoint.flush()
+                    self.stats["write"].record(len(rows), time.perf_counter() - start)
+
+                if time.perf_counter() - last_report >= self.report_interval:
+                    self.report(time.perf_counter() - started)
+                    with self.index_lock:
+                        self.dup_index.save()
+                    last_report = time.perf_counter()
+
+        with self.index_lock:
+            self.dup_index.save()
+
+    # --- RUN ---
+    def report(self, elapsed):
+        print(f"[{elapsed:7.1f}s] queues: crawled={self.crawled.qsize()} "
+              f"translated={self.translated.qsize()} predicted={self.predicted.qsize()}")
+        for stats in self.stats.values():
+            print(stats.report(elapsed))
+
+    def run(self):
+        started = time.perf_counter()
+
+        for sub in self.subreddits:
+            for keyword in SEARCH_KEYWORDS:
+                self.tasks.put((sub, keyword))
+        for _ in range(self.crawl_workers):
+            self.tasks.put(DONE)
+
+        self._start_stage("crawl", self.crawl_workers, self._crawl_worker, self.crawled, self.translate_workers)
+        self._start_stage("translate", self.translate_workers, self._translate_worker, self.translated, self.predict_workers)
+        self._start_stage("predict", self.predict_workers, self._predict_worker, self.predicted, 1)
+
+        self._write_results(started)
+
+        print("\n" + "=" * 50)
+        print(f"Ingest finished. Output: {os.path.abspath(self.output_file)}")
+        self.report(time.perf_counter() - started)
+        print("=" * 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl, translate and predict posts as one streaming pipeline.")
+    parser.add_argument("--subreddits", nargs="+", default=SUBREDDITS)
+    parser.add_argument("--crawl-workers", type=int, default=1)
+    parser.add_argument("--translate-workers", type=int, default=4)
+    parser.add_argument("--predict-workers", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=32, help="Max posts per model.predict call")
+    parser.add_argument("--queue-size", type=int, default=100, help="Capacity of each inter-stage queue")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE)
+    parser.add_argument("--report-interval", type=float, default=10, help="Seconds between throughput reports")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"Error: Model not found at {args.model}")
+        return
+
+    print("Loading model...")
+    model = joblib.load(args.model)
+
+    pipeline = IngestPipeline(
+        model,
+        args.subreddits,
+        crawl_workers=args.crawl_workers,
+        translate_workers=args.translate_workers,
+        predict_workers=args.predict_workers,
+        batch_size=args.batch_size,
+        queue_size=args.queue_size,
+        output_file=args.output,
+        checkpoint_file=args.checkpoint,
+        report_interval=args.report_interval,
+    )
+    pipeline.run()
+
+    # Dropped batches are only reported above; signal them to callers/schedulers too
+    if pipeline.stats["predict"].failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,19 @@
 import pandas as pd
 from deep_translator import GoogleTranslator
 import time
+import os
+
+# Chạy được cả dạng script (python translate.py) lẫn module (python -m app.utils.translate)
+try:
+    from .dedup import NearDuplicateIndex, copy_from_originals, in_batch_duplicates
+except ImportError:
+    from dedup import NearDuplicateIndex, copy_from_originals, in_batch_duplicates
 
 # --- CẤU HÌNH ---
-INPUT_FILE = "./data/voz_data_filtered.csv"
-OUTPUT_FILE = "./data/voz_data_english.csv"
+# Đường dẫn tính theo vị trí file này (app/data), không phụ thuộc thư mục đang chạy
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+INPUT_FILE = os.path.join(DATA_DIR, "voz_data_filtered.csv")
+OUTPUT_FILE = os.path.join(DATA_DIR, "voz_data_english.csv")
 
 # 1. TỪ ĐIỂN MAP SLANG (Quan trọng nhất để giữ Sentiment)
 # Model tiếng Anh sẽ không hiểu "reset" là "tự tử", nên ta phải map tay trước.
@@ -52,6 +61,21 @@ def map_vietnamese_slang(text):
             
     return text_lower
 
+def translate_one(translator, text):
+    """Dịch 1 đoạn text (đã map slang, cắt ngắn). Lỗi mạng sẽ được raise ra ngoài."""
+    # 1. Xử lý slang trước
+    precessed_text = map_vietnamese_slang(text)
+    
+    # 2. Cắt ngắn nếu quá dài (Google Translate giới hạn ~5000 ký tự)
+    if len(precessed_text) > 4500:
+        precessed_text = precessed_text[:4500]
+    
+    # 3. Dịch
+    # Nếu text rỗng hoặc quá ngắn thì bỏ qua
+    if len(precessed_text) < 3: 
+        return ""
+    return translator.translate(precessed_text)
+
 def translate_batch(text_series):
     """
     Hàm dịch cả cột dữ liệu.
@@ -65,21 +89,7 @@ def translate_batch(text_series):
     
     for i, text in enumerate(text_series):
         try:
-            # 1. Xử lý slang trước
-            precessed_text = map_vietnamese_slang(text)
-            
-            # 2. Cắt ngắn nếu quá dài (Google Translate giới hạn ~5000 ký tự)
-            if len(precessed_text) > 4500:
-                precessed_text = precessed_text[:4500]
-            
-            # 3. Dịch
-            # Nếu text rỗng hoặc quá ngắn thì bỏ qua
-            if len(precessed_text) < 3: 
-                translated = ""
-            else:
-                translated = translator.translate(precessed_text)
-            
-            results.append(translated)
+            results.append(translate_one(translator, text))
             
             # In tiến độ mỗi 10 dòng
             if (i + 1) % 10 == 0:
@@ -92,36 +102,67 @@ def translate_batch(text_series):
     return results
 
 # --- MAIN EXECUTION ---
-try:
-    # 1. Load dữ liệu
-    print("Đang đọc file dữ liệu...")
-    df = pd.read_csv(INPUT_FILE)
+if __name__ == "__main__":
+    try:
+        # 1. Load dữ liệu
+        print("Đang đọc file dữ liệu...")
+        df = pd.read_csv(INPUT_FILE, dtype={'id': str, 'duplicate_of': str})
+    
+        # Fill NaN bằng chuỗi rỗng để tránh lỗi
+        df['full_text'] = df['full_text'].fillna('')
+    
+        # 2. Thực hiện dịch
+        # Bài gần trùng (cột 'duplicate_of' từ crawl.py) dùng lại bản dịch đã lưu trong index
+        dup_index = NearDuplicateIndex.load()
+        if 'duplicate_of' not in df.columns:
+            df['duplicate_of'] = None
+        df['translated_text'] = [
+            dup_index.get_result(dup_id, 'translated_text') if isinstance(dup_id, str) else None
+            for dup_id in df['duplicate_of']
+        ]
+        cached = df['translated_text'].notna()
+        
+        # Bài trùng có bài gốc trong cùng lần crawl: dịch bài gốc trước rồi copy sang
+        in_batch = in_batch_duplicates(df) & ~cached
+        need_translate = ~cached & ~in_batch
+        print(f"Dùng lại bản dịch cho {(cached | in_batch).sum()} bài gần trùng.")
     
-    # Fill NaN bằng chuỗi rỗng để tránh lỗi
-    df['full_text'] = df['full_text'].fillna('')
+        # Ta dịch cột 'full_text' (Tiêu đề + Nội dung) để có ngữ cảnh đầy đủ nhất
+        df.loc[need_translate, 'translated_text'] = translate_batch(df.loc[need_translate, 'full_text'])
+        
+        # Bài gốc dịch lỗi thì không có gì để copy: dịch riêng các bài trùng của nó
+        translated_ids = df.loc[df['translated_text'].fillna('') != '', 'id']
+        retry = in_batch & ~df['duplicate_of'].isin(translated_ids)
+        if retry.any():
+            print(f"Dịch lại {retry.sum()} bài trùng có bài gốc dịch lỗi.")
+            df.loc[retry, 'translated_text'] = translate_batch(df.loc[retry, 'full_text'])
+        copy_from_originals(df, ['translated_text'], in_batch & ~retry)
     
-    # 2. Thực hiện dịch
-    # Ta dịch cột 'full_text' (Tiêu đề + Nội dung) để có ngữ cảnh đầy đủ nhất
-    df['translated_text'] = translate_batch(df['full_text'])
+        # Lưu bản dịch mới vào index để các lần crawl sau dùng lại
+        for post_id, translated in zip(df.loc[need_translate, 'id'], df.loc[need_translate, 'translated_text']):
+            if isinstance(translated, str) and translated:
+                dup_index.set_result(str(post_id), translated_text=translated)
+        dup_index.save()
     
-    # 3. Làm sạch sau khi dịch
-    # Bỏ các dòng dịch lỗi (None) hoặc rỗng
-    df_clean = df.dropna(subset=['translated_text'])
-    df_clean = df_clean[df_clean['translated_text'] != ""]
+        # 3. Làm sạch sau khi dịch
+        # Bỏ các dòng dịch lỗi (None) hoặc rỗng
+        df_clean = df.dropna(subset=['translated_text'])
+        df_clean = df_clean[df_clean['translated_text'] != ""]
     
-    # 4. Lưu kết quả
-    # Chỉ giữ lại các cột cần thiết cho Model
-    final_cols = ['id', 'created_utc', 'date_readable', 'translated_text', 'full_text']
-    df_clean[final_cols].to_csv(OUTPUT_FILE, index=False, encoding='utf-8-sig')
+        # 4. Lưu kết quả
+        # Chỉ giữ lại các cột cần thiết cho Model
+        final_cols = ['id', 'created_utc', 'date_readable', 'translated_text', 'full_text', 'subreddit', 'duplicate_of']
+        final_cols = [c for c in final_cols if c in df_clean.columns]
+        df_clean[final_cols].to_csv(OUTPUT_FILE, index=False, encoding='utf-8-sig')
     
-    print("\n" + "="*50)
-    print("HOÀN TẤT!")
-    print(f"File kết quả: {OUTPUT_FILE}")
-    print(f"Số lượng mẫu sẵn sàng cho Model: {len(df_clean)}")
-    print("="*50)
+        print("\n" + "="*50)
+        print("HOÀN TẤT!")
+        print(f"File kết quả: {OUTPUT_FILE}")
+        print(f"Số lượng mẫu sẵn sàng cho Model: {len(df_clean)}")
+        print("="*50)
     
-    # Xem thử 3 dòng đầu
-    print(df_clean[['full_text', 'translated_text']].head(3))
+        # Xem thử 3 dòng đầu
+        print(df_clean[['full_text', 'translated_text']].head(3))
 
-except FileNotFoundError:
-    print(f"Lỗi: Không tìm thấy file '{INPUT_FILE}'. Hãy chạy script crawl trước!")
\ No newline at end of file
+    except FileNotFoundError:
+        print(f"Lỗi: Không tìm thấy file '{INPUT_FILE}'. Hãy chạy script crawl trước!")
\ No newline at end of file